@@ -1,8 +1,10 @@
 from argparse import ArgumentParser, ArgumentTypeError
+from collections import deque
 from dataclasses import dataclass
-from itertools import cycle
+import functools
+from itertools import accumulate, chain, cycle, islice, repeat
 import logging
-from typing import List, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
 import pygame
 from pygame import Surface
 import random
@@ -39,16 +41,16 @@ WHITE = (255, 255, 255)
 Color = Tuple[int, int, int]
 
 
-def gen_colors() -> List[Color]:
+def gen_colors() -> Tuple[Color, ...]:
     step = 20
     start = 50
     stop = 256 - start
-    return [
+    return tuple(
         (r, g, b)
         for r in range(start, stop, step)
         for g in range(start, stop, step)
         for b in range(start, stop, step)
-    ]
+    )
 
 
 COLORS = gen_colors()
@@ -60,33 +62,57 @@ def random_color() -> Color:
 
 @dataclass(frozen=True)
 class Point:
+    # declared by hand, dataclass(slots=True) requires python 3.10
+    __slots__ = ("x", "y")
+
     x: int
     y: int
 
+    def __hash__(self) -> int:
+        # pack both coordinates into one int instead of hashing a tuple,
+        # distinct for every point on the board since HEIGHT < 1024
+        return self.x * 1024 + self.y
+
     def __add__(self, other: "Point") -> "Point":
         return Point(self.x + other.x, self.y + other.y)
 
-    def set_x(self, x: int) -> "Point":
-        return Point(x, self.y)
 
-    def set_y(self, y: int) -> "Point":
-        return Point(self.x, y)
+def cell_index(x: int, y: int) -> int:
+    """return the index of the grid cell containing the pixel (x, y)"""
+    return (y // RECT_SIZE) * COLS + x // RECT_SIZE
 
 
 class Apple:
+    __slots__ = ("point", "color")
+
     def __init__(self, point: Point, color: Color):
         self.point = point
         self.color = color
 
 
 class Snake:
-    _MOVES = {
-        Direction.NONE: Point(0, 0),
-        Direction.UP: Point(0, -RECT_SIZE),
-        Direction.DOWN: Point(0, +RECT_SIZE),
-        Direction.LEFT: Point(-RECT_SIZE, 0),
-        Direction.RIGHT: Point(+RECT_SIZE, 0),
-    }
+    __slots__ = (
+        "xs",
+        "ys",
+        "size",
+        "direction",
+        "colors",
+        "_current_move",
+        "_mv_x",
+        "_mv_y",
+        "occupied",
+        "_overlaps",
+    )
+
+    # indexed by Direction.value, enum.auto() starts at 1
+    _MOVES = (
+        None,
+        Point(0, 0),
+        Point(0, -RECT_SIZE),
+        Point(0, +RECT_SIZE),
+        Point(-RECT_SIZE, 0),
+        Point(+RECT_SIZE, 0),
+    )
 
     def __init__(self, points: List[Point], colors: List[Color]):
         if len(points) == 0:
@@ -94,9 +120,42 @@ class Snake:
         if len(points) != len(colors):
             raise GameException("points and colors must have the same length")
         self.points = points
-        self.size = len(self.points)
+        self.size = len(points)
         self.direction = Direction.NONE
         self.colors = colors
+        self._set_move(self._MOVES[Direction.NONE.value])
+
+    @property
+    def points(self) -> List[Point]:
+        return [Point(x, y) for x, y in zip(self.xs, self.ys)]
+
+    @points.setter
+    def points(self, points: List[Point]):
+        if any(p.x < 0 or p.x >= WIDTH or p.y < 0 or p.y >= HEIGHT for p in points):
+            raise GameException("points must be on the board")
+        self.xs: Deque[int] = deque(p.x for p in points)
+        self.ys: Deque[int] = deque(p.y for p in points)
+        # bit cell_index(x, y) is set for every cell covered by the snake,
+        # extra segments sharing a cell are counted in _overlaps
+        self.occupied = 0
+        self._overlaps: Dict[int, int] = {}
+        for p in points:
+            self._add_cell(cell_index(p.x, p.y))
+
+    def _add_cell(self, i: int):
+        if (self.occupied >> i) & 1:
+            self._overlaps[i] = self._overlaps.get(i, 0) + 1
+        else:
+            self.occupied |= 1 << i
+
+    def _remove_cell(self, i: int):
+        count = self._overlaps.get(i, 0)
+        if count > 1:
+            self._overlaps[i] = count - 1
+        elif count == 1:
+            del self._overlaps[i]
+        else:
+            self.occupied &= ~(1 << i)
 
     def set_direction(self, direction: Direction):
         if direction == Direction.NONE:
@@ -105,39 +164,55 @@ class Snake:
             return
 
         self.direction = direction
+        self._set_move(self._MOVES[direction.value])
+
+    def _set_move(self, move: Point):
+        self._current_move = move
+        self._mv_x, self._mv_y = move.x, move.y
 
     def _is_reverse_move(self, direction: Direction) -> bool:
-        if len(self.points) == 1:
+        if len(self.xs) == 1:
             return False
-        current_move = self._MOVES[direction]
+        current_move = self._MOVES[direction.value]
         head = self._move(self.head(), current_move)
-        return head == self.points[1]
+        return head == Point(self.xs[1], self.ys[1])
 
     def current_move(self) -> Point:
-        return self._MOVES[self.direction]
+        return self._current_move
 
     def head(self) -> Point:
-        return self.points[0]
+        return Point(self.xs[0], self.ys[0])
 
     def collide_wall(self) -> bool:
-        point = self.head() + self.current_move()
+        x = self.xs[0] + self._mv_x
+        y = self.ys[0] + self._mv_y
 
-        if point.x < 0 or point.x + RECT_SIZE > WIDTH:
+        if x < 0 or x + RECT_SIZE > WIDTH:
             return True
 
-        if point.y < 0 or point.y + RECT_SIZE > HEIGHT:
+        if y < 0 or y + RECT_SIZE > HEIGHT:
             return True
 
         return False
 
     def collide_itself(self) -> bool:
-        return len(set(self.points)) != len(self.points)
-
-    def move(self):
-        if self.current_move() == Point(0, 0):
-            return
-        self.points.insert(0, self._move(self.head(), self.current_move()))
-        self.points = self.points[: self.size]
+        return len(self._overlaps) > 0
+
+    def move(self) -> Optional[Point]:
+        """move the snake, return the point left by the tail if any"""
+        if self._mv_x == 0 and self._mv_y == 0:
+            return None
+        head = self._move_through_walls(
+            Point(self.xs[0] + self._mv_x, self.ys[0] + self._mv_y)
+        )
+        tail = None
+        if len(self.xs) >= self.size:
+            tail = Point(self.xs.pop(), self.ys.pop())
+            self._remove_cell(cell_index(tail.x, tail.y))
+        self.xs.appendleft(head.x)
+        self.ys.appendleft(head.y)
+        self._add_cell(cell_index(head.x, head.y))
+        return tail
 
     def eat(self, apple: Apple) -> bool:
         if self.head() == apple.point:
@@ -152,17 +227,8 @@ class Snake:
         return point
 
     def _move_through_walls(self, point: Point) -> Point:
-        if point.x < 0:
-            point = point.set_x(WIDTH - RECT_SIZE)
-        elif point.x + RECT_SIZE > WIDTH:
-            point = point.set_x(0)
-
-        if point.y < 0:
-            point = point.set_y(HEIGHT - RECT_SIZE)
-        elif point.y + RECT_SIZE > HEIGHT:
-            point = point.set_y(0)
-
-        return point
+        # RECT_SIZE divides WIDTH and HEIGHT, so wrapping is a plain modulo
+        return Point(point.x % WIDTH, point.y % HEIGHT)
 
 
 def new_snake() -> Snake:
@@ -179,51 +245,78 @@ def new_snake_sized(size: int) -> Snake:
     head = Point(w * RECT_SIZE, h * RECT_SIZE)
 
     moves = [
-        [+RECT_SIZE, 0],
-        [0, +RECT_SIZE],
-        [-RECT_SIZE, 0],
-        [0, -RECT_SIZE],
+        (+RECT_SIZE, 0),
+        (0, +RECT_SIZE),
+        (-RECT_SIZE, 0),
+        (0, -RECT_SIZE),
     ]
-
-    points = [head]
-    colors = [RED] + [random_color() for _ in range(size - 1)]
-
-    moves = cycle(moves)
     pattern = [val for val in range(2, 100, 2) for _ in (0, 1)]
 
-    for n, move in zip(pattern, moves):
-        for _ in range(n):
-            if len(points) >= size:
-                return Snake(points[::-1], colors)
-            i = len(points) - 1
-            body = Point(points[i].x + move[0], points[i].y + move[1])
-            points.append(body)
-
-    raise GameException("fail to create snake")
+    # displacement of every segment from the previous one, walking the spiral
+    steps = list(
+        islice(
+            chain.from_iterable(repeat(m, n) for n, m in zip(pattern, cycle(moves))),
+            size - 1,
+        )
+    )
+    if len(steps) < size - 1:
+        raise GameException("fail to create snake")
+
+    xs = accumulate((dx for dx, _ in steps), initial=head.x)
+    ys = accumulate((dy for _, dy in steps), initial=head.y)
+    points = [Point(x, y) for x, y in zip(xs, ys)]
+    if any(p.x < 0 or p.x >= WIDTH or p.y < 0 or p.y >= HEIGHT for p in points):
+        raise GameException("snake does not fit the board")
+    colors = [RED] + [random_color() for _ in range(size - 1)]
+    return Snake(points[::-1], colors)
 
 
 def new_apple(snake: Snake) -> Apple:
-    free_cells = set()
-    for x in range(0, WIDTH // RECT_SIZE):
-        for y in range(0, HEIGHT // RECT_SIZE):
-            free_cells.add((x, y))
+    occupied = snake.occupied
+
+    # while the board is mostly free, random draws almost always hit a free
+    # cell, so avoid enumerating the whole grid
+    if bin(occupied).count("1") < ROWS * COLS * 0.8:
+        for _ in range(ROWS * COLS):
+            i = random.randrange(ROWS * COLS)
+            if not (occupied >> i) & 1:
+                return new_apple_at(i)
 
-    for s in snake.points:
-        x, y = s.x // RECT_SIZE, s.y // RECT_SIZE
-        free_cells.discard((x, y))
+    free_cells = [i for i in range(ROWS * COLS) if not (occupied >> i) & 1]
 
     if len(free_cells) == 0:
         raise GameException("fail to create new apple")
 
-    h, w = random.choice(list(free_cells))
-    point = Point(w * RECT_SIZE, h * RECT_SIZE)
+    return new_apple_at(random.choice(free_cells))
+
+
+def new_apple_at(i: int) -> Apple:
+    y, x = divmod(i, COLS)
+    point = Point(x * RECT_SIZE, y * RECT_SIZE)
     return Apple(point, random_color())
 
 
+@functools.lru_cache(maxsize=None)
+def _font(name: str, size: int, bold: bool = False) -> pygame.font.Font:
+    return pygame.font.SysFont(name, size, bold=bold)
+
+
+@functools.lru_cache(maxsize=8)
+def _render_text(text: str) -> Surface:
+    font_style = _font("", 50)
+    return font_style.render(text, True, RED)
+
+
+@functools.lru_cache(maxsize=8)
+def _render_lines(texts: Tuple[str, ...]) -> Tuple[Surface, ...]:
+    font_size = min(WIDTH, HEIGHT) // 10
+    font_style = _font("monospace", font_size, bold=True)
+    return tuple(font_style.render(text, True, RED) for text in texts)
+
+
 def display_text(screen: Surface, text: str):
-    font_style = pygame.font.SysFont("", 50)
     screen.fill(WHITE)
-    surface = font_style.render(text, True, RED)
+    surface = _render_text(text)
     h = WIDTH / 2 - surface.get_width() / 2
     w = HEIGHT / 2 - surface.get_height() / 2
     screen.blit(surface, [h, w])
@@ -231,11 +324,9 @@ def display_text(screen: Surface, text: str):
 
 
 def display_multiline_text(screen: Surface, texts: List[str]):
-    font_size = min(WIDTH, HEIGHT) // 10
-    font_style = pygame.font.SysFont("monospace", font_size, bold=True)
     screen.fill(WHITE)
 
-    surfaces = [font_style.render(text, True, RED) for text in texts]
+    surfaces = _render_lines(tuple(texts))
     total_height = sum([s.get_height() for s in surfaces])
     max_width = max([s.get_width() for s in surfaces])
 
@@ -248,18 +339,31 @@ def display_multiline_text(screen: Surface, texts: List[str]):
     pygame.display.flip()
 
 
-def draw_point(screen: Surface, color: Color, point: Point):
-    pygame.draw.rect(screen, color, Rect(point.x, point.y, RECT_SIZE, RECT_SIZE))
+def draw_point(screen: Surface, color: Color, point: Point) -> Rect:
+    rect = Rect(point.x, point.y, RECT_SIZE, RECT_SIZE)
+    return pygame.draw.rect(screen, color, rect)
 
 
-def display_apple(screen: Surface, apple: Apple):
-    draw_point(screen, apple.color, apple.point)
+def display_apple(screen: Surface, apple: Apple) -> Rect:
+    return draw_point(screen, apple.color, apple.point)
 
 
-def display_snake(screen: Surface, snake: Snake):
-    draw_point(screen, snake.colors[0], snake.points[0])
-    for c, s in zip(snake.colors[1:], snake.points[1:]):
-        draw_point(screen, c, s)
+@functools.lru_cache(maxsize=None)
+def _segment_surface(color: Color) -> Surface:
+    surface = Surface((RECT_SIZE, RECT_SIZE))
+    surface.fill(color)
+    return surface
+
+
+def display_snake(screen: Surface, snake: Snake) -> List[Rect]:
+    # a single blits call in body order, grouping by color wouldn't save calls
+    # and would change which segment is on top where the body overlaps itself
+    return screen.blits(
+        [
+            (_segment_surface(c), (x, y))
+            for c, x, y in zip(snake.colors, snake.xs, snake.ys)
+        ]
+    )
 
 
 def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
@@ -269,6 +373,11 @@ def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
     game_speed = 10
     clock = pygame.time.Clock()
 
+    # only these events are handled, let SDL drop everything else
+    handled_events = [pygame.QUIT, pygame.KEYDOWN, pygame.VIDEOEXPOSE]
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(handled_events)
+
     def init_state():
         snake = new_snake_sized(size)
         apple = new_apple(snake)
@@ -277,6 +386,8 @@ def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
 
     snake, apple, direction = init_state()
     game_over = True
+    redraw = True
+    menu_dirty = True
 
     help_msg = [
         "Start     S",
@@ -291,10 +402,22 @@ def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
     }
 
     while True:
-        for event in pygame.event.get():
+        if game_over and not menu_dirty:
+            # nothing changes on the menu until an event arrives, so sleep on
+            # the queue instead of polling it
+            events = [pygame.event.wait()]
+            events += pygame.event.get(handled_events)
+        else:
+            events = pygame.event.get(handled_events)
+
+        for event in events:
             if event.type == pygame.QUIT:
                 return
+            if event.type == pygame.VIDEOEXPOSE:
+                redraw = True
+                menu_dirty = True
             if event.type == pygame.KEYDOWN:
+                menu_dirty = True
                 if event.key == pygame.K_ESCAPE:
                     logger.info("quit")
                     return
@@ -302,12 +425,16 @@ def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
                     logger.info("start")
                     snake, apple, direction = init_state()
                     game_over = False
+                    redraw = True
                 elif event.key in directions:
                     logger.info(f"set direction: {direction}")
                     direction = directions[event.key]
 
         if game_over:
-            display_multiline_text(screen, help_msg)
+            # the menu is static, redraw it only when something happened
+            if menu_dirty:
+                display_multiline_text(screen, help_msg)
+                menu_dirty = False
             continue
 
         snake.set_direction(direction)
@@ -315,11 +442,13 @@ def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
         if wall and snake.collide_wall():
             logger.info("collide wall")
             game_over = True
+            menu_dirty = True
             continue
 
         if body and snake.collide_itself():
             logger.info("collide itself")
             game_over = True
+            menu_dirty = True
             continue
 
         if snake.eat(apple):
@@ -330,17 +459,30 @@ def run_game(screen: Surface, wall=False, body=False, speed=False, size=1):
             except GameException:
                 logger.info("fail to create new apply")
                 game_over = True
+                menu_dirty = True
                 continue
             if speed:
                 logger.info(f"increase game speed: {game_speed}")
                 game_speed += 1
 
-        snake.move()
-
-        screen.fill(WHITE)
-        display_snake(screen, snake)
-        display_apple(screen, apple)
-        pygame.display.flip()
+        tail = snake.move()
+
+        if redraw:
+            screen.fill(WHITE)
+            display_snake(screen, snake)
+            display_apple(screen, apple)
+            pygame.display.flip()
+            redraw = False
+        else:
+            # segment colors are bound to positions, so the whole body is
+            # redrawn, but only the cell left by the tail has to be cleared
+            dirty = []
+            if tail is not None:
+                rect = Rect(tail.x, tail.y, RECT_SIZE, RECT_SIZE)
+                dirty.append(screen.fill(WHITE, rect))
+            dirty += display_snake(screen, snake)
+            dirty.append(display_apple(screen, apple))
+            pygame.display.update(dirty)
 
         clock.tick(game_speed)
 
@@ -384,6 +526,11 @@ if __name__ == "__main__":
     )
     args = ap.parse_args()
 
+    try:
+        new_snake_sized(args.size)
+    except GameException as e:
+        ap.error(f"argument -z/--size: {e}")
+
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("snake")
@@ -10,10 +10,21 @@ from snake import (
     Direction,
     HEIGHT,
     WIDTH,
+    ROWS,
+    COLS,
+    GameException,
+    new_apple,
+    new_snake_sized,
+    cell_index,
 )
 
 
 class SnakeGameTests(unittest.TestCase):
+    def test_init(self):
+        # points off the board, should fail
+        self.assertRaises(GameException, Snake, [Point(-RECT_SIZE, 0)], [RED])
+        self.assertRaises(GameException, Snake, [Point(0, HEIGHT)], [RED])
+
     def test_set_direction(self):
         def new_snake():
             return Snake([Point(0, 0), Point(RECT_SIZE, 0)], [RED, RED])
@@ -64,6 +75,22 @@ class SnakeGameTests(unittest.TestCase):
         snake.points += [Point(0, 0)]
         self.assertTrue(snake.collide_itself())
 
+        square = [Point(0, 0), Point(RECT_SIZE, 0), Point(RECT_SIZE, RECT_SIZE)]
+
+        # moving into the cell the tail leaves, shouldn't collide itself
+        snake = Snake(square + [Point(0, RECT_SIZE)], [RED] * 4)
+        snake.set_direction(Direction.DOWN)
+        snake.move()
+        self.assertFalse(snake.collide_itself())
+
+        # moving into the body, should collide itself
+        snake = Snake(
+            square + [Point(0, RECT_SIZE), Point(0, RECT_SIZE * 2)], [RED] * 5
+        )
+        snake.set_direction(Direction.DOWN)
+        snake.move()
+        self.assertTrue(snake.collide_itself())
+
     def test_move(self):
         def new_snake():
             return Snake([Point(0, 0)], [RED])
@@ -99,9 +126,14 @@ class SnakeGameTests(unittest.TestCase):
         # the position of the second segment should be equal to the previous position of the first
         snake = Snake([Point(0, RECT_SIZE), Point(0, 0)], [RED, RED])
         snake.set_direction(Direction.DOWN)
-        snake.move()
+        self.assertEqual(snake.move(), Point(0, 0))
         self.assertEqual(snake.points, [Point(0, RECT_SIZE * 2), Point(0, RECT_SIZE)])
 
+        # the grown snake shouldn't leave a cell
+        snake.size += 1
+        self.assertIsNone(snake.move())
+        self.assertEqual(len(snake.points), 3)
+
     def test_eat(self):
         # should eat
         snake = Snake([Point(0, 0)], [RED])
@@ -117,6 +149,53 @@ class SnakeGameTests(unittest.TestCase):
         self.assertEqual(snake.size, 1)
         self.assertEqual(snake.colors, [RED])
 
+    def test_new_snake_sized(self):
+        snake = new_snake_sized(10)
+        self.assertEqual(len(snake.points), 10)
+        self.assertFalse(snake.collide_itself())
+
+        # the largest spiral that fits the board
+        snake = new_snake_sized(162)
+        self.assertEqual(len(snake.points), 162)
+        self.assertFalse(snake.collide_itself())
+
+        # doesn't fit the board, should fail
+        self.assertRaises(GameException, new_snake_sized, 163)
+
+    def test_occupied(self):
+        snake = Snake([Point(0, 0), Point(RECT_SIZE, 0)], [RED, RED])
+        self.assertEqual(snake.occupied, 0b11)
+
+        # should follow the head and the tail
+        snake.set_direction(Direction.DOWN)
+        snake.move()
+        expected = 1 << cell_index(0, RECT_SIZE) | 1 << cell_index(0, 0)
+        self.assertEqual(snake.occupied, expected)
+
+    def test_new_apple(self):
+        # shouldn't be placed on the snake
+        snake = Snake([Point(0, 0), Point(RECT_SIZE, 0)], [RED, RED])
+        for _ in range(100):
+            apple = new_apple(snake)
+            self.assertNotIn(apple.point, snake.points)
+
+        # should be placed on the last free cell
+        points = [
+            Point(x * RECT_SIZE, y * RECT_SIZE)
+            for y in range(ROWS)
+            for x in range(COLS)
+            if (x, y) != (COLS - 1, ROWS - 1)
+        ]
+        snake = Snake(points, [RED] * len(points))
+        apple = new_apple(snake)
+        self.assertEqual(
+            apple.point, Point((COLS - 1) * RECT_SIZE, (ROWS - 1) * RECT_SIZE)
+        )
+
+        # no free cells, should fail
+        snake.points += [apple.point]
+        self.assertRaises(GameException, new_apple, snake)
+
 
 if __name__ == "__main__":
     unittest.main()